@@ -4,209 +4,256 @@ Comprehensive data analysis for Aurora Q&A System
 Identifies anomalies, inconsistencies, and insights in member data.
 """
 
-import json
+import heapq
 import re
-from collections import Counter, defaultdict
+from collections import defaultdict
 from datetime import datetime, timezone
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator
 
-def load_data():
-    """Load messages from JSON file."""
-    with open('messages_dump.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data.get('items', [])
+import ijson
 
-def analyze_temporal_patterns(messages: List[Dict]) -> Dict:
-    """Analyze timestamp patterns and anomalies."""
-    timestamps = []
-    future_dates = []
-    past_dates = []
-    invalid_dates = []
+# Optional C fast path for ISO-8601 timestamps
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    def parse_datetime(ts: str) -> datetime:
+        return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+
+def iter_messages(path: str = 'messages_dump.json') -> Iterator[Dict]:
+    """Stream messages from the JSON dump one at a time without loading the whole file."""
+    with open(path, 'rb') as f:
+        yield from ijson.items(f, 'items.item')
+
+# Topic keywords; a message is assigned the first topic with any matching keyword
+TOPICS = {
+    'travel': ['trip', 'travel', 'flight', 'jet', 'paris', 'london', 'tokyo', 'monaco', 'santorini'],
+    'dining': ['restaurant', 'reservation', 'dinner', 'french laundry', 'eleven madison'],
+    'entertainment': ['tickets', 'concert', 'opera', 'movie', 'premiere'],
+    'accommodation': ['hotel', 'villa', 'room', 'booking'],
+    'payment': ['payment', 'paid', 'processed', 'invoice', 'charge'],
+    'preferences': ['prefer', 'preference', 'seat', 'aisle', 'window', 'smoking']
+}
+# One alternation per topic, in TOPICS order, so classification stops at the first topic that hits
+TOPIC_PATTERNS = [
+    (topic, re.compile('|'.join(re.escape(keyword) for keyword in keywords)))
+    for topic, keywords in TOPICS.items()
+]
+
+# Fields every message is expected to have
+REQUIRED_FIELDS = ('id', 'user_id', 'user_name', 'timestamp', 'message')
+
+# PII detection; search() stops at the first hit of each kind
+PII_PATTERNS = (
+    ('phone', re.compile(r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}')),
+    ('email', re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')),
+    ('card', re.compile(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b')),
+)
+# Every PII pattern needs a digit or '@', so ASCII text without them can skip the scan
+PII_TRIGGER_CHARS = frozenset("0123456789@")
+
+class Accumulators:
+    """
+    Running state for every analysis, updated in a single pass over the messages.
+    Call update() once per message, then read the summaries from
+    temporal(), users(), content(), consistency() and topics().
+    """
+    
+    def __init__(self):
+        self.total_messages = 0
+        
+        # Temporal
+        self.now = datetime.now(timezone.utc)
+        self.old_cutoff = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        self.valid_timestamps = 0
+        self.invalid_timestamps = 0
+        self.earliest = None
+        self.latest = None
+        self.future_dates = 0
+        self.past_dates = 0
+        self.future_date_examples = []
+        self.old_date_examples = []
+        
+        # Users: name -> [message count, user_ids], so each message costs one lookup
+        self.user_stats = {}
+        
+        # Content
+        self.empty_messages = 0
+        self.very_short = 0
+        self.very_long = 0
+        self.total_message_length = 0
+        self.message_text_counter = defaultdict(int)
+        self.pii_counts = {'phone': 0, 'email': 0, 'card': 0}
+        self.pii_examples = {'phone': [], 'email': [], 'card': []}
+        
+        # Consistency
+        self.missing_fields = dict.fromkeys(REQUIRED_FIELDS, 0)
+        self.name_variations = defaultdict(set)
+        
+        # Topics
+        self.topic_counts = defaultdict(int)
     
-    for msg in messages:
+    def update(self, msg: Dict) -> None:
+        """Fold one message into every analysis."""
+        self.total_messages += 1
+        message = msg.get('message', '')
+        message_lower = message.lower()
+        
+        # Temporal: timestamp patterns and anomalies
         ts = msg.get('timestamp')
         if not ts:
-            invalid_dates.append(msg)
-            continue
+            self.invalid_timestamps += 1
+        else:
+            try:
+                dt = parse_datetime(ts)
+                
+                # Check for future dates (beyond reasonable range)
+                if dt > self.now:
+                    self.future_dates += 1
+                    if len(self.future_date_examples) < 5:
+                        self.future_date_examples.append((msg['user_name'], dt, msg['message'][:50]))
+                
+                # Check for very old dates (before 2020)
+                if dt < self.old_cutoff:
+                    self.past_dates += 1
+                    if len(self.old_date_examples) < 5:
+                        self.old_date_examples.append((msg['user_name'], dt, msg['message'][:50]))
+                
+                # Running date range
+                if self.earliest is None or dt < self.earliest:
+                    self.earliest = dt
+                if self.latest is None or dt > self.latest:
+                    self.latest = dt
+                
+                # Counted only once the comparisons above succeeded: a naive
+                # timestamp raises TypeError there and is counted as invalid
+                self.valid_timestamps += 1
+            except (ValueError, TypeError, AttributeError, KeyError):
+                self.invalid_timestamps += 1
         
-        try:
-            dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-            timestamps.append(dt)
-            
-            # Check for future dates (beyond reasonable range)
-            if dt > datetime.now(timezone.utc):
-                future_dates.append((msg['user_name'], dt, msg['message'][:50]))
-            
-            # Check for very old dates (before 2020)
-            if dt < datetime(2020, 1, 1, tzinfo=timezone.utc):
-                past_dates.append((msg['user_name'], dt, msg['message'][:50]))
-        except:
-            invalid_dates.append(msg)
-    
-    return {
-        'total_messages': len(messages),
-        'valid_timestamps': len(timestamps),
-        'invalid_timestamps': len(invalid_dates),
-        'future_dates': len(future_dates),
-        'very_old_dates': len(past_dates),
-        'date_range': {
-            'earliest': min(timestamps).strftime("%B %d, %Y") if timestamps else None,
-            'latest': max(timestamps).strftime("%B %d, %Y") if timestamps else None
-        },
-        'future_date_examples': future_dates[:5],
-        'old_date_examples': past_dates[:5]
-    }
-
-def analyze_user_patterns(messages: List[Dict]) -> Dict:
-    """Analyze user distribution and patterns."""
-    user_counts = Counter(msg['user_name'] for msg in messages)
-    user_ids = defaultdict(set)
-    
-    # Check for user_id inconsistencies
-    for msg in messages:
-        user_name = msg.get('user_name')
+        # Users: distribution and user_id inconsistencies
+        user_name = msg['user_name']
+        stats = self.user_stats.get(user_name)
+        if stats is None:
+            stats = self.user_stats[user_name] = [0, set()]
+        stats[0] += 1
         user_id = msg.get('user_id')
         if user_name and user_id:
-            user_ids[user_name].add(user_id)
-    
-    # Find users with multiple user_ids (inconsistency)
-    inconsistent_users = {
-        name: ids for name, ids in user_ids.items() 
-        if len(ids) > 1
-    }
-    
-    return {
-        'total_users': len(user_counts),
-        'total_messages': len(messages),
-        'avg_messages_per_user': len(messages) / len(user_counts) if user_counts else 0,
-        'top_10_users': dict(user_counts.most_common(10)),
-        'users_with_single_message': sum(1 for count in user_counts.values() if count == 1),
-        'users_with_multiple_ids': len(inconsistent_users),
-        'inconsistent_user_examples': dict(list(inconsistent_users.items())[:5])
-    }
-
-def analyze_message_content(messages: List[Dict]) -> Dict:
-    """Analyze message content quality and patterns."""
-    empty_messages = []
-    very_short = []
-    very_long = []
-    duplicate_messages = []
-    message_texts = []
-    
-    # PII detection
-    phone_pattern = r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    card_pattern = r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b'
-    
-    messages_with_phone = []
-    messages_with_email = []
-    messages_with_card = []
-    
-    message_text_counter = Counter()
-    
-    for msg in messages:
-        message = msg.get('message', '')
-        message_texts.append(message)
-        message_text_counter[message.lower().strip()] += 1
+            stats[1].add(user_id)
+        
+        # Content: quality and patterns
+        self.total_message_length += len(message)
+        self.message_text_counter[message_lower.strip()] += 1
         
         # Length analysis
         if not message or len(message.strip()) == 0:
-            empty_messages.append(msg['user_name'])
+            self.empty_messages += 1
         elif len(message) < 10:
-            very_short.append((msg['user_name'], message))
+            self.very_short += 1
         elif len(message) > 500:
-            very_long.append((msg['user_name'], len(message)))
+            self.very_long += 1
         
-        # PII detection
-        if re.search(phone_pattern, message):
-            messages_with_phone.append((msg['user_name'], message[:100]))
-        if re.search(email_pattern, message):
-            messages_with_email.append((msg['user_name'], message[:100]))
-        if re.search(card_pattern, message):
-            messages_with_card.append((msg['user_name'], message[:100]))
-    
-    # Find duplicates (appearing more than once)
-    duplicates = {text: count for text, count in message_text_counter.items() if count > 1}
-    
-    return {
-        'empty_messages': len(empty_messages),
-        'very_short_messages': len(very_short),
-        'very_long_messages': len(very_long),
-        'avg_message_length': sum(len(m) for m in message_texts) / len(message_texts) if message_texts else 0,
-        'duplicate_messages': len(duplicates),
-        'duplicate_examples': dict(list(duplicates.items())[:5]),
-        'messages_with_phone': len(messages_with_phone),
-        'messages_with_email': len(messages_with_email),
-        'messages_with_card': len(messages_with_card),
-        'pii_examples': {
-            'phone': messages_with_phone[:3],
-            'email': messages_with_email[:3],
-            'card': messages_with_card[:3]
-        }
-    }
-
-def analyze_data_consistency(messages: List[Dict]) -> Dict:
-    """Analyze data structure consistency."""
-    missing_fields = {
-        'id': 0,
-        'user_id': 0,
-        'user_name': 0,
-        'timestamp': 0,
-        'message': 0
-    }
-    
-    inconsistent_names = []
-    name_variations = defaultdict(set)
-    
-    for msg in messages:
-        # Check missing fields
-        for field in missing_fields:
+        # PII detection: each message is counted at most once per kind
+        if not (message.isascii() and PII_TRIGGER_CHARS.isdisjoint(message)):
+            for kind, pattern in PII_PATTERNS:
+                if pattern.search(message):
+                    self.pii_counts[kind] += 1
+                    if len(self.pii_examples[kind]) < 3:
+                        self.pii_examples[kind].append((msg['user_name'], message[:100]))
+        
+        # Consistency: missing fields
+        missing_fields = self.missing_fields
+        for field in REQUIRED_FIELDS:
             if not msg.get(field):
                 missing_fields[field] += 1
         
         # Check name consistency (case, spacing)
-        user_name = msg.get('user_name', '')
         if user_name:
             normalized = user_name.lower().strip()
-            name_variations[normalized].add(user_name)
-    
-    # Find name variations (same person, different formatting)
-    name_inconsistencies = {
-        norm: list(variations) 
-        for norm, variations in name_variations.items() 
-        if len(variations) > 1
-    }
+            self.name_variations[normalized].add(user_name)
+        
+        # Topics: first topic (in TOPICS order) with any keyword in the message
+        topic = next((topic for topic, pattern in TOPIC_PATTERNS if pattern.search(message_lower)), None)
+        if topic is not None:
+            self.topic_counts[topic] += 1
+    
+    def temporal(self) -> Dict:
+        """Timestamp patterns and anomalies."""
+        return {
+            'total_messages': self.total_messages,
+            'valid_timestamps': self.valid_timestamps,
+            'invalid_timestamps': self.invalid_timestamps,
+            'future_dates': self.future_dates,
+            'very_old_dates': self.past_dates,
+            'date_range': {
+                'earliest': self.earliest.strftime("%B %d, %Y") if self.earliest else None,
+                'latest': self.latest.strftime("%B %d, %Y") if self.latest else None
+            },
+            'future_date_examples': self.future_date_examples,
+            'old_date_examples': self.old_date_examples
+        }
     
-    return {
-        'missing_fields': missing_fields,
-        'name_inconsistencies': len(name_inconsistencies),
-        'name_variation_examples': dict(list(name_inconsistencies.items())[:5])
-    }
-
-def analyze_topic_distribution(messages: List[Dict]) -> Dict:
-    """Analyze message topics and categories."""
-    topics = {
-        'travel': ['trip', 'travel', 'flight', 'jet', 'paris', 'london', 'tokyo', 'monaco', 'santorini'],
-        'dining': ['restaurant', 'reservation', 'dinner', 'french laundry', 'eleven madison'],
-        'entertainment': ['tickets', 'concert', 'opera', 'movie', 'premiere'],
-        'accommodation': ['hotel', 'villa', 'room', 'booking'],
-        'payment': ['payment', 'paid', 'processed', 'invoice', 'charge'],
-        'preferences': ['prefer', 'preference', 'seat', 'aisle', 'window', 'smoking']
-    }
+    def users(self) -> Dict:
+        """User distribution and patterns."""
+        user_counts = {name: count for name, (count, _) in self.user_stats.items()}
+        
+        # Find users with multiple user_ids (inconsistency)
+        inconsistent_users = {
+            name: ids for name, (_, ids) in self.user_stats.items() 
+            if len(ids) > 1
+        }
+        
+        return {
+            'total_users': len(user_counts),
+            'total_messages': self.total_messages,
+            'avg_messages_per_user': self.total_messages / len(user_counts) if user_counts else 0,
+            'top_10_users': dict(heapq.nlargest(10, user_counts.items(), key=lambda item: item[1])),
+            'users_with_single_message': sum(1 for count in user_counts.values() if count == 1),
+            'users_with_multiple_ids': len(inconsistent_users),
+            'inconsistent_user_examples': dict(list(inconsistent_users.items())[:5])
+        }
     
-    topic_counts = defaultdict(int)
+    def content(self) -> Dict:
+        """Message content quality and patterns."""
+        n = self.total_messages
+        pii = self.pii_counts
+        
+        # Find duplicates (appearing more than once)
+        duplicates = {text: count for text, count in self.message_text_counter.items() if count > 1}
+        
+        return {
+            'empty_messages': self.empty_messages,
+            'very_short_messages': self.very_short,
+            'very_long_messages': self.very_long,
+            'avg_message_length': self.total_message_length / n if n else 0,
+            'duplicate_messages': len(duplicates),
+            'duplicate_examples': dict(list(duplicates.items())[:5]),
+            'messages_with_phone': pii['phone'],
+            'messages_with_email': pii['email'],
+            'messages_with_card': pii['card'],
+            'pii_examples': self.pii_examples
+        }
     
-    for msg in messages:
-        message_lower = msg.get('message', '').lower()
-        for topic, keywords in topics.items():
-            if any(keyword in message_lower for keyword in keywords):
-                topic_counts[topic] += 1
-                break
+    def consistency(self) -> Dict:
+        """Data structure consistency."""
+        # Find name variations (same person, different formatting)
+        name_inconsistencies = {
+            norm: list(variations) 
+            for norm, variations in self.name_variations.items() 
+            if len(variations) > 1
+        }
+        
+        return {
+            'missing_fields': self.missing_fields,
+            'name_inconsistencies': len(name_inconsistencies),
+            'name_variation_examples': dict(list(name_inconsistencies.items())[:5])
+        }
     
-    return {
-        'topic_distribution': dict(topic_counts),
-        'messages_with_no_topic_match': len(messages) - sum(topic_counts.values())
-    }
+    def topics(self) -> Dict:
+        """Message topics and categories."""
+        return {
+            'topic_distribution': dict(self.topic_counts),
+            'messages_with_no_topic_match': self.total_messages - sum(self.topic_counts.values())
+        }
 
 def main():
     """Run comprehensive analysis."""
@@ -214,17 +261,19 @@ def main():
     print("AURORA Q&A SYSTEM - COMPREHENSIVE DATA ANALYSIS")
     print("=" * 80)
     
-    messages = load_data()
+    # Run all analyses in a single pass over the dump
+    acc = Accumulators()
+    for msg in iter_messages():
+        acc.update(msg)
     
-    print(f"\n📊 DATASET OVERVIEW")
-    print(f"Total messages: {len(messages)}")
+    temporal = acc.temporal()
+    users = acc.users()
+    content = acc.content()
+    consistency = acc.consistency()
+    topics = acc.topics()
     
-    # Run all analyses
-    temporal = analyze_temporal_patterns(messages)
-    users = analyze_user_patterns(messages)
-    content = analyze_message_content(messages)
-    consistency = analyze_data_consistency(messages)
-    topics = analyze_topic_distribution(messages)
+    print(f"\n📊 DATASET OVERVIEW")
+    print(f"Total messages: {temporal['total_messages']}")
     
     print("\n" + "=" * 80)
     print("TEMPORAL ANALYSIS")
@@ -1,12 +1,14 @@
 # app.py
 from fastapi import FastAPI, Query, HTTPException
+from fastapi.responses import ORJSONResponse
 from qa_engine import find_answer
 import traceback
 
 app = FastAPI(
     title="Aurora Q&A System",
     description="A simple API that answers natural-language questions about member data.",
-    version="1.0"
+    version="1.0",
+    default_response_class=ORJSONResponse
 )
 
 @app.get("/")
@@ -19,12 +21,12 @@ def root():
     }
 
 @app.get("/ask")
-def ask(question: str = Query(..., description="Enter a natural-language question")):
+async def ask(question: str = Query(..., description="Enter a natural-language question")):
     """
     API endpoint that receives a question and returns an answer.
     """
     try:
-        result = find_answer(question)
+        result = await find_answer(question)
         return result
     except Exception as e:
         # Log the error (will appear in Cloud Logging)
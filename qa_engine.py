@@ -5,18 +5,91 @@ Ensures no sensitive data (IDs, PII, financial info) goes to LLM.
 Sanitization happens ONLY before sending to LLM chat completion.
 """
 
-import requests
-from openai import OpenAI
+import asyncio
+import httpx
+import numpy as np
+import orjson
+from openai import AsyncOpenAI
 import os
 from typing import List, Dict
 import re
+import hashlib
+import heapq
+import time
+from collections import defaultdict
 from dotenv import load_dotenv
 
 # Loading environment variables
 load_dotenv()
 
 # Initializing OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Pooled HTTP client reused across requests so repeated fetches skip the TCP/TLS handshake
+_HTTP = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+    timeout=5,
+    headers={"Accept-Encoding": "gzip"},
+)
+
+# Message list is re-fetched at most once per TTL
+MESSAGES_TTL_SECONDS = 60
+_MESSAGES_CACHE = (float("-inf"), [])
+
+# Message embeddings persisted on disk as L2-normalized float16 rows and memory-mapped
+# on load; a parallel file holds the hash of each row's message text
+EMBEDDINGS_PATH = os.getenv("EMBEDDINGS_PATH", "embeddings.npy")
+EMBEDDING_KEYS_PATH = os.getenv("EMBEDDING_KEYS_PATH", "embedding_keys.npy")
+_EMB_STORE = None  # (key -> row index, matrix), loaded on first use
+
+# User-name matcher, rebuilt only when get_messages() returns a new corpus
+_NAME_MATCHER = (None, None, {}, {})  # (corpus, pattern, name -> names it contains, name -> message rows)
+
+
+# PII patterns, tried in this order. More specific patterns come first so e.g.
+# card numbers are not partially consumed by the phone pattern. The unbounded
+# runs are possessive (`{n,}+`, Python 3.11+) so a failed match never backtracks.
+_PII_PATTERNS = {
+    "email": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    "password": r'\b(?P<password_key>(?i:password|pwd|pass))[:\s]+[\w!@#$%^&*()_+-=]{6,}\b',
+    "card": r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b|\b\d{13,19}\b',
+    "ssn": r'\b\d{3}-\d{2}-\d{4}\b',
+    "ip": r'\b(?:\d{1,3}\.){3}\d{1,3}\b',
+    "token": r'\b(?!http)[A-Za-z0-9]{32,}+\b',
+    "phone": r'(?:\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',
+    "account": r'\b\d{10,}+\b',
+}
+
+
+def _compile_pii(names) -> re.Pattern:
+    return re.compile("|".join(f"(?P<{name}>{_PII_PATTERNS[name]})" for name in names))
+
+
+# All PII patterns combined into a single alternation so each message is scanned once
+PII_RE = _compile_pii(_PII_PATTERNS)
+
+# Every other pattern needs a digit or '@', so ASCII text without them only
+# has to be checked for passwords and tokens
+_PII_TRIGGER_CHARS = frozenset("0123456789@")
+_TEXT_PII_RE = _compile_pii(("password", "token"))
+
+_REPL = {
+    "email": "[EMAIL_REDACTED]",
+    "card": "[CARD_REDACTED]",
+    "ssn": "[SSN_REDACTED]",
+    "ip": "[IP_REDACTED]",
+    "token": "[TOKEN_REDACTED]",
+    "phone": "[PHONE_REDACTED]",
+    "account": "[ACCOUNT_REDACTED]",
+}
+
+
+def _sub(match: re.Match) -> str:
+    """Return the redaction marker for whichever PII group matched."""
+    kind = match.lastgroup
+    if kind == "password":
+        return f"{match.group('password_key')}: [PASSWORD_REDACTED]"
+    return _REPL[kind]
 
 
 def sanitize_message_text(text: str) -> str:
@@ -24,36 +97,9 @@ def sanitize_message_text(text: str) -> str:
     masking the sensitive information from message text.
     Only called before sending to LLM chat completion.
     """
-    sanitized = text
-    
-    # Phone numbers 
-    sanitized = re.sub(r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}', '[PHONE_REDACTED]', sanitized)
-    sanitized = re.sub(r'\d{3}-\d{3}-\d{4}', '[PHONE_REDACTED]', sanitized)
-    sanitized = re.sub(r'\(\d{3}\)\s?\d{3}-\d{4}', '[PHONE_REDACTED]', sanitized)
-    
-    # Email addresses
-    sanitized = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL_REDACTED]', sanitized)
-    
-    # Credit card numbers
-    sanitized = re.sub(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b', '[CARD_REDACTED]', sanitized)
-    sanitized = re.sub(r'\b\d{13,19}\b', lambda m: '[CARD_REDACTED]' if len(m.group().replace('-', '').replace(' ', '')) >= 13 else m.group(), sanitized)
-    
-    # Social Security Numbers 
-    sanitized = re.sub(r'\b\d{3}-\d{2}-\d{4}\b', '[SSN_REDACTED]', sanitized)
-    
-    # API keys/tokens 
-    sanitized = re.sub(r'\b[A-Za-z0-9]{32,}\b', lambda m: '[TOKEN_REDACTED]' if not m.group().startswith('http') else m.group(), sanitized)
-    
-    # IP addresses
-    sanitized = re.sub(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', '[IP_REDACTED]', sanitized)
-    
-    # Bank account numbers
-    sanitized = re.sub(r'\b\d{10,}\b', lambda m: '[ACCOUNT_REDACTED]' if len(m.group()) > 9 else m.group(), sanitized)
-    
-    # Passwords
-    sanitized = re.sub(r'(?i)\b(password|pwd|pass)[:\s]+[\w!@#$%^&*()_+-=]{6,}\b', r'\1: [PASSWORD_REDACTED]', sanitized)
-    
-    return sanitized
+    if text.isascii() and _PII_TRIGGER_CHARS.isdisjoint(text):
+        return _TEXT_PII_RE.sub(_sub, text)
+    return PII_RE.sub(_sub, text)
 
 
 def sanitize_message(msg: Dict) -> Dict:
@@ -63,49 +109,193 @@ def sanitize_message(msg: Dict) -> Dict:
     2. Sanitizing message text content
     3. Only including necessary fields for Q&A
     """
+    ts = msg.get("timestamp")
     return {
         "user_name": msg.get("user_name", "Unknown"),  
         "message": sanitize_message_text(msg.get("message", "")),  
-        "date": msg.get("timestamp", "")[:10] if msg.get("timestamp") else None, 
+        "date": ts[:10] if ts else None, 
     }
 
 
-def get_messages():
-    """Fetch all member messages from the public API."""
+def format_context_line(msg: Dict) -> str:
+    """Sanitizing a message straight into its LLM context line (same fields as sanitize_message)."""
+    ts = msg.get("timestamp")
+    line = f"- {msg.get('user_name', 'Unknown')}: {sanitize_message_text(msg.get('message', ''))}"
+    return f"{line} (date: {ts[:10]})" if ts else line
+
+
+async def get_messages():
+    """Fetch all member messages from the public API (cached for MESSAGES_TTL_SECONDS)."""
+    global _MESSAGES_CACHE
+    fetched_at, items = _MESSAGES_CACHE
+    if time.monotonic() - fetched_at < MESSAGES_TTL_SECONDS:
+        return items
+    
     url = "https://november7-730026606190.europe-west1.run.app/messages"
-    response = requests.get(url)
+    response = await _HTTP.get(url)
     response.raise_for_status()
-    data = response.json()
-    return data.get("items", [])
+    data = orjson.loads(response.content)
+    items = data.get("items", [])
+    # Lowercasing names once per fetch instead of on every question
+    for msg in items:
+        msg["_user_name_lower"] = msg.get("user_name", "").lower()
+    _MESSAGES_CACHE = (time.monotonic(), items)
+    return items
 
 
-def get_embedding(text: str) -> List[float]:
-    """Get embedding for text. Uses original text (not sanitized)."""
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    return response.data[0].embedding
+# The embeddings endpoint accepts at most this many inputs per request
+EMBEDDING_BATCH_SIZE = 2048
+
+
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embeddings for many texts in as few requests as possible. Uses original text (not sanitized)."""
+    embeddings = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        response = await client.embeddings.create(
+            model="text-embedding-3-small",
+            input=texts[start:start + EMBEDDING_BATCH_SIZE]
+        )
+        embeddings.extend(item.embedding for item in response.data)
+    return embeddings
+
 
+def _embedding_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
 
-def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
-    """Calculate cosine similarity."""
-    dot_product = sum(a * b for a, b in zip(vec1, vec2))
-    mag1 = sum(a * a for a in vec1) ** 0.5
-    mag2 = sum(b * b for b in vec2) ** 0.5
-    return dot_product / (mag1 * mag2) if mag1 * mag2 > 0 else 0.0
 
+def _normalize_rows(E: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(E, axis=1, keepdims=True)
+    return E / np.where(norms > 0, norms, 1.0)
 
-def find_answer(question: str):
+
+def _load_embedding_store():
+    """Return the (key -> row index, matrix) store, reading it from disk on first use."""
+    global _EMB_STORE
+    if _EMB_STORE is None:
+        try:
+            keys = np.load(EMBEDDING_KEYS_PATH).tolist()
+            matrix = np.load(EMBEDDINGS_PATH, mmap_mode="r")
+        except (OSError, ValueError):
+            keys, matrix = [], None
+        if matrix is None or len(keys) != len(matrix):
+            # Missing or half-written store: rebuild from scratch
+            keys, matrix = [], None
+        _EMB_STORE = ({key: row for row, key in enumerate(keys)}, matrix)
+    return _EMB_STORE
+
+
+def _save_embedding_store(index: Dict[str, int], matrix: np.ndarray) -> np.ndarray:
+    """Atomically write the store to disk and return the matrix memory-mapped from it."""
+    keys = np.array(sorted(index, key=index.get), dtype="<U32")
+    for path, array in ((EMBEDDING_KEYS_PATH, keys), (EMBEDDINGS_PATH, matrix)):
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(path + ".tmp", path)
+    return np.load(EMBEDDINGS_PATH, mmap_mode="r")
+
+
+async def get_question_embedding(question: str) -> np.ndarray:
+    """Get the embedding for a question. Questions are not stored."""
+    (embedding,) = await get_embeddings([question])
+    return np.asarray(embedding, dtype=np.float32)
+
+
+async def get_message_embeddings(texts: List[str]) -> np.ndarray:
+    """
+    Get a (len(texts), dim) matrix of message embeddings.
+    Embeddings are read from the on-disk store; only texts missing from it
+    are sent to the embeddings endpoint, and then persisted.
+    """
+    global _EMB_STORE
+    keys = [_embedding_key(text) for text in texts]
+    index, _ = _load_embedding_store()
+    misses = {key: text for key, text in zip(keys, texts) if key not in index}
+    
+    if misses:
+        fetched = await get_embeddings(list(misses.values()))
+        
+        index, matrix = _load_embedding_store()
+        # Another request may have stored some of these while we were waiting
+        new = {key: embedding for key, embedding in zip(misses, fetched) if key not in index}
+        if new:
+            rows = _normalize_rows(np.asarray(list(new.values()), dtype=np.float32)).astype(np.float16)
+            matrix = rows if matrix is None else np.concatenate([matrix, rows])
+            index = {**index, **{key: len(index) + i for i, key in enumerate(new)}}
+            try:
+                matrix = _save_embedding_store(index, matrix)
+            except OSError as e:
+                # Keep serving from memory if the store cannot be written
+                print(f"Could not persist embeddings: {e}")
+            _EMB_STORE = (index, matrix)
+    
+    index, matrix = _load_embedding_store()
+    if not keys:
+        return np.empty((0, 0), dtype=np.float32)
+    return matrix[[index[key] for key in keys]].astype(np.float32)
+
+
+def top_similar(query: np.ndarray, embeddings: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return indices of the k embeddings most cosine-similar to query, best first.
+    Rows must already be L2-normalized (as stored by get_message_embeddings), so
+    scoring is a single matrix-vector product.
+    """
+    k = min(k, len(embeddings))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
     
-    messages = get_messages()
+    E = np.asarray(embeddings, dtype=np.float32)
+    q = np.asarray(query, dtype=np.float32)
+    q_norm = np.linalg.norm(q)
+    if q_norm > 0:
+        q = q / q_norm
+    sims = E @ q
+    
+    top_idx = np.argpartition(-sims, k - 1)[:k]
+    return top_idx[np.argsort(-sims[top_idx], kind="stable")]
+
+
+def _get_name_matcher(messages: List[Dict]):
+    """Return the (pattern, contained, rows) name matcher for this corpus, building it on first use."""
+    global _NAME_MATCHER
+    corpus, pattern, contained, rows = _NAME_MATCHER
+    if corpus is not messages:
+        rows = defaultdict(list)
+        for row, msg in enumerate(messages):
+            rows[msg["_user_name_lower"]].append(row)
+        names = set(rows) - {""}
+        # Longest names first so each position reports the longest name starting there;
+        # `contained` then adds any shorter names inside it
+        pattern = re.compile(
+            "(?=(" + "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True)) + "))"
+        ) if names else None
+        contained = {name: {other for other in names if other in name} for name in names}
+        _NAME_MATCHER = (messages, pattern, contained, rows)
+    return pattern, contained, rows
+
+
+def match_person_messages(question: str, messages: List[Dict]) -> List[Dict]:
+    """
+    Return the messages from users mentioned in the question, in corpus order.
+    The question is scanned once and the messages come from the cached per-name index.
+    """
+    pattern, contained, rows = _get_name_matcher(messages)
+    matched = set()
+    if pattern is not None:
+        for m in pattern.finditer(question.lower()):
+            matched |= contained[m.group(1)]
+    return [messages[row] for row in heapq.merge(*(rows[name] for name in matched))]
+
+
+async def find_answer(question: str):
+    
+    # Fetching the corpus and embedding the question are independent: overlapping them
+    messages, question_embedding = await asyncio.gather(
+        get_messages(), get_question_embedding(question)
+    )
     
     # Step 1: Filtering by person name (optimization)
-    question_lower = question.lower()
-    person_matched = [
-        msg for msg in messages
-        if msg["user_name"].lower() in question_lower
-    ]
+    person_matched = match_person_messages(question, messages)
     
   
     if person_matched:
@@ -118,31 +308,16 @@ def find_answer(question: str):
             candidates = candidates[:100]
     
     # Step 2: using embeddings to get top most similar messages
-    question_embedding = get_embedding(question)
-    scored = []
-    
-    for msg in candidates:
-        msg_embedding = get_embedding(msg['message'])
-        similarity = cosine_similarity(question_embedding, msg_embedding)
-        scored.append((similarity, msg))  # Storing original message
+    embeddings = await get_message_embeddings([msg['message'] for msg in candidates])
     
     # Getting top candidates (more if person-matched for better context)
     top_count = 7 if person_matched else 10
-    top_candidates = sorted(scored, key=lambda x: x[0], reverse=True)[:top_count]
-    top_messages = [msg for _, msg in top_candidates]
+    top_idx = top_similar(question_embedding, embeddings, top_count)
+    top_messages = [candidates[i] for i in top_idx]
     
     # Step 3: SANITIZING HERE - right before sending to LLM
-    # Preparing sanitized messages for LLM context
-    sanitized_messages = []
-    for msg in top_messages:
-        sanitized_msg = sanitize_message(msg)
-        sanitized_messages.append(sanitized_msg)
-    
-    # Step 4: Formatting sanitized messages for LLM
-    messages_context = "\n".join([
-        f"- {msg['user_name']}: {msg['message']}" + (f" (date: {msg['date']})" if msg.get('date') else "")
-        for msg in sanitized_messages
-    ])
+    # Step 4: Formatting sanitized messages for LLM context
+    messages_context = "\n".join(format_context_line(msg) for msg in top_messages)
     
     # Step 5: LLM reasons about the question and generates direct answer
     system_prompt = """You are a helpful assistant that answers questions based on member messages.
@@ -184,7 +359,7 @@ Based on these messages, answer the question directly.
 Answer:"""
     
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -225,7 +400,10 @@ if __name__ == "__main__":
         "What are Amira's favorite restaurants?"
     ]
     
-    for q in test_questions:
-        print(f"\nQ: {q}")
-        result = find_answer(q)
-        print(f"A: {result['answer']}")
\ No newline at end of file
+    async def main():
+        for q in test_questions:
+            print(f"\nQ: {q}")
+            result = await find_answer(q)
+            print(f"A: {result['answer']}")
+    
+    asyncio.run(main())
\ No newline at end of file